@@ -21,8 +21,8 @@ The Psi method estimates the sensory threshold based on previous responses.
 A psychometric function is fitted to the data collected so far so that the 
 logarithmic likelihood is maximized. This is implemented by searching for the
 minimum negative logarithmic likelihood using the function 'minimize' from 
-scipy.optimize and the 'Nelder-Mead' method (see the script MaxLikelihoodEstimation.py 
-for further information)
+scipy.optimize and the 'BFGS' method, falling back to 'Nelder-Mead' if it does not 
+converge (see the script MaxLikelihoodEstimation.py for further information)
 
 A modification to the method described in [1] is implemented to avoid the same 
 stimulus intensity to be presented multiple consecutive times. This tends to 
@@ -61,19 +61,29 @@ TO DOs:
 # Required libraries
 import tkinter as tk
 import random
+import logging
 import numpy as np
 from MaxLikelihoodEstimation import MLE_search
 from PsychometricFunctionClass import PsychometricFunction
-import time
+
+# Test progress is logged at debug level, which is not shown unless logging is configured;
+# a Next click without a choice is logged as a warning
+logger = logging.getLogger(__name__)
 
 # Threshold measurements varaibles
 # Test parameters
 MaxTrials = 30                  # After which the test stops
 MinTrials = 0.30*MaxTrials      # Stimuli intensity for the first number of trials is presented at random
-StimLevels = np.arange(0,15,1)  # Array of stimulus intensity levels
+STIM_MIN, STIM_STEP = 0, 1      # First value and step of the stimulus intensity grid
+StimLevels = np.arange(STIM_MIN,15,STIM_STEP)  # Array of stimulus intensity levels
 Gamma = 0.5                     # Depends on the type of test; the M-Force Choice methods Gamma = 1/M
 Lambda = 0.01                   # If not known from experience, this is usually set to 0.01 
+HideDelay = 200                 # Time in ms the lines are hidden between trials
 typef = "Logistic"              # Maximum number of time the same value of stimulus intensity can be presented consecutively
+seed = None                     # Random generator seed; set an integer to reproduce a test sequence
+
+# Random number generator used for every stimulus choice
+_rng = random.Random(seed)
 
 
 def NewLinesLengths(size_base, size_add):
@@ -84,7 +94,7 @@ def NewLinesLengths(size_base, size_add):
     
     # Additional length summed to the baseline lenth to 
     # either lina A or B randomly
-    if random.choice(['A','B']) == 'A':
+    if _rng.getrandbits(1):
         size_lineA += size_add
     else:
         size_lineB += size_add
@@ -104,15 +114,15 @@ def InitialiseLines(size_base):
     
     # Random choice of stimuli levels is assigned as the additional length of one 
     # of the presented lines
-    size_lineA, size_lineB = NewLinesLengths(size_base, np.random.choice(StimLevels))
+    size_lineA, size_lineB = NewLinesLengths(size_base, StimLevels[_rng.randrange(len(StimLevels))])
     
     # Save lines length values in array
-    lineA_length.append(size_lineA)
-    lineB_length.append(size_lineB)
+    lineA_length[root.counter] = size_lineA
+    lineB_length[root.counter] = size_lineB
     
     # Draw lines on Canvas A and B
-    lineA = canvasA.create_line(LinesCoordinates(size_lineA))
-    lineB = canvasB.create_line(LinesCoordinates(size_lineB))
+    lineA = canvasA.create_line(_COORD_CACHE[size_lineA])
+    lineB = canvasB.create_line(_COORD_CACHE[size_lineB])
     
     return lineA, lineB
 
@@ -120,12 +130,8 @@ def InitialiseLines(size_base):
 def HideLines():
 
     # Give lines length '0'
-    canvasA.coords(lineA, LinesCoordinates(0)) 
-    canvasB.coords(lineB, LinesCoordinates(0))
-
-    # Add delay for lines to hide before new lines are presented
-    root.update()
-    time.sleep(0.2)
+    canvasA.coords(lineA, _COORD_CACHE[0]) 
+    canvasB.coords(lineB, _COORD_CACHE[0])
 
 
 def GetNextLengths():
@@ -133,7 +139,7 @@ def GetNextLengths():
     # Choose next stimulus intensity randomly for the first few trials
     if root.counter < MinTrials: 
         # Choose next stimulus intensity randomly
-        StimIndex = random.choice(range(len(StimLevels)))
+        StimIndex = _rng.randrange(len(StimLevels))
         
         
     else:            
@@ -143,23 +149,19 @@ def GetNextLengths():
         
         # Use entropy's maximum likelihood value if the search terminates 
         # succesfully otherwise choose next stimulus intensity at random
-        if results.success is True:
-            # Print PF parameters found
+        if results.success:
+            # Log PF parameters found
             alpha, beta = results.x[0], results.x[1]
-            print("alpha = ", alpha, " ; beta = ", beta)
+            logger.debug("alpha = %s ; beta = %s", alpha, beta)
             
-            # Find stim level closest to alpha and set as current 
-            diff = abs(StimLevels-results.x[0])
-            StimIndex = np.unravel_index(np.argmin(diff, axis=0), diff.shape)
-            StimIndex = np.random.choice(a=np.arange(StimIndex[0]-2,StimIndex[0]+3,1))
-            if StimIndex < 0:
-                StimIndex = 0
-            elif StimIndex > len(StimLevels)-1:
-                StimIndex = len(StimLevels)-1
+            # Find stim level closest to alpha on the regular grid of levels
+            # and choose the current one at random within a range around it
+            center = int(round((alpha-STIM_MIN)/STIM_STEP))
+            StimIndex = max(0, min(len(StimLevels)-1, _rng.randint(center-2, center+2)))
 
         else:
             # Choose next stimulus intensity at random
-            StimIndex = random.choice(range(len(StimLevels)))
+            StimIndex = _rng.randrange(len(StimLevels))
 
     # Current Stimulus level by obtained index
     size_add = StimLevels[StimIndex]
@@ -172,39 +174,50 @@ def PresentNextLines():
     # Get next lines lengths values according to adaptive method
     size_lineA, size_lineB = GetNextLengths()
 
-    # Store new lengths values                
-    lineA_length.append(size_lineA)
-    lineB_length.append(size_lineB)
+    # Store new lengths values at the current trial index
+    lineA_length[root.counter] = size_lineA
+    lineB_length[root.counter] = size_lineB
     
     # Update lines A and B lengths
-    canvasA.coords(lineA, LinesCoordinates(size_lineA)) 
-    canvasB.coords(lineB, LinesCoordinates(size_lineB)) 
+    canvasA.coords(lineA, _COORD_CACHE[size_lineA]) 
+    canvasB.coords(lineB, _COORD_CACHE[size_lineB]) 
     
     # Deselect A/B radiobuttons#
     selectA.deselect()
     selectB.deselect()
 
 
+def ShowNextLines():
+
+    # Present next pair of lines once the hiding delay has elapsed
+    # and allow the next choice to be submitted
+    PresentNextLines()
+    btn_next.config(state=tk.NORMAL)
+
+
 def UpdateResultsVariablesByChoice():
     
-    # Find index of stimulus
-    stimulus_value = abs(lineA_length[-1]-lineB_length[-1])
-    stimulus_index = np.where(StimLevels == stimulus_value)
+    # Lines lengths presented in the current trial
+    size_lineA, size_lineB = int(lineA_length[root.counter]), int(lineB_length[root.counter])
+
+    # Find index of stimulus on the regular grid of levels
+    stimulus_value = abs(size_lineA-size_lineB)
+    stimulus_index = int(stimulus_value - STIM_MIN) // STIM_STEP
     
     # Increment the total number of stimulus intensity presented
     Total[stimulus_index] += 1
-    print(stimulus_value)
+    logger.debug("Stimulus value: %s", stimulus_value)
     
     # Determine correct or incorrect response
-    if lineA_length[-1] > lineB_length[-1]:
+    if size_lineA > size_lineB:
         correct = 'A'
-    elif lineB_length[-1] > lineA_length[-1]:
+    elif size_lineB > size_lineA:
         correct = 'B'
     else:
         correct = 'Equal'
             
     # Increment number of correct responses if required
-    if correct == choice[-1]:
+    if correct == choice[root.counter]:
         NumCorrect[stimulus_index] += 1
     elif correct == 'Equal':
         NumCorrect[stimulus_index] += 0.5        
@@ -234,15 +247,26 @@ def PlotResults():
     PF.plot_PFestimate(x, StimLevels, NumCorrect, Total)
 
 
+def WarmUpMLE():
+
+    # Run one MLE search on dummy data so that imports and compilation
+    # happen before the first adaptive trial rather than during it.
+    # The responses follow a PF centred on the stimulus levels so that the
+    # search has a finite fit, and are passed as the same array types used
+    # in the test so that the compiled code is reused by the trials
+    Total = 2*np.ones(len(StimLevels))
+    PF = PsychometricFunction(Alpha=np.mean(StimLevels), Beta=1,
+                              Gamma=Gamma, Lambda=Lambda, type_func=typef)
+    NumCorrect = Total*PF.PF(StimLevels)
+    MLE_search(Gamma, Lambda, typef, StimLevels, NumCorrect, Total)
+
+
 # Define Next button callback function
 def NextCallback():
     
-    # Increase trail counter
-    root.counter += 1
-    
     # Check if an option is selected, otherwise show error message
     if not Option.get():
-        print("No choice made!")
+        logger.warning("No choice made!")
 
     else:
 
@@ -252,22 +276,28 @@ def NextCallback():
         HideLines()
         
         # Store results
-        choice.append(Option.get())
+        choice[root.counter] = Option.get()
         
         # Update reults variable
         UpdateResultsVariablesByChoice()
         
-        # Print data
-        print("Trail counter: ", root.counter)
-        print("Line A:",lineA_length)
-        print("Line B:",lineB_length)
-        print("Choice: ", choice)
+        # Increase trail counter once the current trial has been answered
+        root.counter += 1
+        
+        # Log data
+        logger.debug("Trail counter: %s", root.counter)
+        logger.debug("Line A: %s", lineA_length[:root.counter])
+        logger.debug("Line B: %s", lineB_length[:root.counter])
+        logger.debug("Choice: %s", choice[:root.counter])
 
         # If number of trails has not exceed a maximum, 
-        # then Show next pair of lines
+        # then Show next pair of lines after a delay for the lines to hide.
+        # The delay is scheduled on the event loop so that the GUI keeps
+        # responding meanwhile; the Next button is disabled until then
         if root.counter < MaxTrials:
             
-            PresentNextLines()
+            btn_next.config(state=tk.DISABLED)
+            root.after(HideDelay, ShowNextLines)
                                     
         # Otherwise, end program and show results        
         else:
@@ -276,7 +306,7 @@ def NextCallback():
             HideWidgets()
             
             # Show end message
-            print("END!")
+            logger.debug("END!")
             intrs_txt.config(text="You have finished the test!")
             
             # Plot results
@@ -285,11 +315,11 @@ def NextCallback():
             
 # Initial varaibles
 root = tk.Tk()
-root.counter = 0
-choice = []
+root.counter = 0  # Number of answered trials, also index of the current trial
+choice = np.empty(MaxTrials, dtype='U1')
 stim = []
-lineA_length = []
-lineB_length = []
+lineA_length = np.empty(MaxTrials, dtype=np.int32)
+lineB_length = np.empty(MaxTrials, dtype=np.int32)
 NumCorrect = np.zeros(len(StimLevels))
 Total = np.zeros(len(StimLevels))
 
@@ -305,6 +335,10 @@ canvasB = tk.Canvas(root, width=canvas_width, height=canvas_height)
 
 # Initial lines length based on random choice of stimulus intentity
 size_base = 150 # baseline lines' length
+
+# Lines coordinates for every possible length (hidden or base plus a stimulus level)
+_COORD_CACHE = {L: LinesCoordinates(L) for L in {0} | {size_base + int(v) for v in StimLevels}}
+
 lineA, lineB = InitialiseLines(size_base)
 
 # Select buttons
@@ -331,6 +365,7 @@ btn_next.grid(row=3,column=1)
 
 # Initialise GUI
 root.geometry("600x800")
+root.after_idle(WarmUpMLE)
 root.mainloop()
 
 
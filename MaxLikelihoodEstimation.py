@@ -11,9 +11,91 @@ and beta parameters of a psychometric function
 from PsychometricFunctionClass import PsychometricFunction
 from scipy.optimize import fsolve
 from scipy.optimize import minimize
+from scipy.special import expit
 import numpy as np
 import matplotlib.pyplot as plt
+import math
 
+# Numba is optional: without it the likelihood is evaluated with vectorized NumPy
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+
+# Probabilities are kept away from 0 and 1 so that the logarithms are finite
+P_MIN, P_MAX = 1e-12, 1-1e-12
+
+# Largest |Beta*(x-Alpha)| over the stimulus levels accepted for the initial guess
+# of a Logistic PF; beyond it the PF is saturated and its gradient vanishes
+MAX_LOGISTIC_ARG = 10
+
+if HAVE_NUMBA:
+
+    # Negative log likelihood of a Logistic PF compiled by Numba
+    @njit(cache=True, fastmath=True)
+    def _neg_loglik(params, StimLevels, NumCorrect, Total, gamma, lam):
+        # Coefficients to be found
+        alpha, beta = params[0], params[1]
+        LL = 0.0
+        for i in range(StimLevels.shape[0]):
+            # Logistic psychometric function at the current stimulus level
+            p = gamma + (1-gamma-lam) / (1 + math.exp(-beta*(StimLevels[i]-alpha)))
+            p = min(max(p, P_MIN), P_MAX)
+            LL += NumCorrect[i]*math.log(p) + (Total[i]-NumCorrect[i])*math.log(1-p)
+        return -LL
+
+    # Analytic gradient of '_neg_loglik' with respect to alpha and beta
+    @njit(cache=True, fastmath=True)
+    def _neg_loglik_grad(params, StimLevels, NumCorrect, Total, gamma, lam):
+        alpha, beta = params[0], params[1]
+        grad = np.zeros(2)
+        for i in range(StimLevels.shape[0]):
+            # Logistic sigmoid and PF value at the current stimulus level
+            s = 1 / (1 + math.exp(-beta*(StimLevels[i]-alpha)))
+            p = gamma + (1-gamma-lam) * s
+            p = min(max(p, P_MIN), P_MAX)
+            # dLL/dp * dp/dz, with z = beta*(x-alpha)
+            dLL_dz = (NumCorrect[i]/p - (Total[i]-NumCorrect[i])/(1-p)) * (1-gamma-lam) * s * (1-s)
+            grad[0] += dLL_dz * beta
+            grad[1] -= dLL_dz * (StimLevels[i]-alpha)
+        return grad
+
+else:
+
+    # Scratch array reused by every evaluation of the PF over the stimulus levels
+    _p = np.empty(0)
+
+    def _logistic_PF(params, StimLevels, gamma, lam):
+        # Evaluate the Logistic PF in place on the scratch array
+        global _p
+        if _p.shape != StimLevels.shape:
+            _p = np.empty_like(StimLevels, dtype=np.float64)
+        alpha, beta = params[0], params[1]
+        np.subtract(StimLevels, alpha, out=_p)
+        np.multiply(_p, beta, out=_p)
+        expit(_p, out=_p)
+        np.multiply(_p, 1-gamma-lam, out=_p)
+        np.add(_p, gamma, out=_p)
+        return _p
+
+    # Negative log likelihood of a Logistic PF
+    def _neg_loglik(params, StimLevels, NumCorrect, Total, gamma, lam):
+        p = np.clip(_logistic_PF(params, StimLevels, gamma, lam), P_MIN, P_MAX, out=_p)
+        return -(np.dot(NumCorrect, np.log(p)) + np.dot(Total-NumCorrect, np.log1p(-p)))
+
+    # Analytic gradient of '_neg_loglik' with respect to alpha and beta
+    def _neg_loglik_grad(params, StimLevels, NumCorrect, Total, gamma, lam):
+        alpha, beta = params[0], params[1]
+        # Logistic sigmoid recovered from the PF values
+        p = _logistic_PF(params, StimLevels, gamma, lam)
+        s = (p - gamma) / (1-gamma-lam)
+        p = np.clip(p, P_MIN, P_MAX, out=p)
+        # dLL/dp * dp/dz, with z = beta*(x-alpha)
+        dLL_dz = (NumCorrect/p - (Total-NumCorrect)/(1-p)) * (1-gamma-lam) * s * (1-s)
+        return np.array([np.sum(dLL_dz) * beta,
+                         -np.dot(dLL_dz, StimLevels-alpha)])
 
 
 def MLE_search(Gamma, Lambda, type_func, StimLevels, NumCorrect, Total):
@@ -25,9 +107,9 @@ def MLE_search(Gamma, Lambda, type_func, StimLevels, NumCorrect, Total):
         # Psychometric function
         PF =  PsychometricFunction(Alpha=Alpha, Beta=Beta, Gamma=Gamma, Lambda=Lambda,
                                    type_func=type_func)
-        # Negative log likelihood
-        LL = - (np.sum(np.log(PF.PF(StimLevels)) * NumCorrect) + 
-                np.sum(np.log(1-PF.PF(StimLevels)) * (Total - NumCorrect)))
+        # Negative log likelihood (PF evaluated once over all stimulus levels)
+        p = np.clip(PF.PF(StimLevels), P_MIN, P_MAX)
+        LL = - (np.dot(NumCorrect, np.log(p)) + np.dot(Total - NumCorrect, np.log1p(-p)))
         
         return LL
 
@@ -49,12 +131,35 @@ def MLE_search(Gamma, Lambda, type_func, StimLevels, NumCorrect, Total):
                                        type_func=type_func)
             return PF.PF(x1)-y1
         
-        b = fsolve(pf,1)
+        b, info, ier, msg = fsolve(pf, 1, full_output=True)
+        b = b[0]
 
-        return [a, b]
+        # Where no solution is found or the Logistic PF is saturated over the
+        # whole range of stimulus levels the likelihood is flat (zero gradient)
+        # and the search stalls at the guess. Start instead from a finite beta
+        # scaled to the mean spacing between stimulus levels
+        half_range = (StimLevels[-1]-StimLevels[0])/2
+        if ier != 1 or not np.isfinite(b) or \
+           (type_func == "Logistic" and abs(b)*half_range > MAX_LOGISTIC_ARG):
+            b = (len(StimLevels)-1)/(StimLevels[-1]-StimLevels[0])
+
+        return np.array([a, b], dtype=np.float64)
     
     guess = DefineInitialMLESearchParam()
-    results = minimize(MLE_PF, guess, method = 'Nelder-Mead', options={'disp': True})
+
+    if type_func == "Logistic":
+        # Use the compiled objective on contiguous float64 copies of the data
+        args = (np.ascontiguousarray(StimLevels, dtype=np.float64),
+                np.ascontiguousarray(NumCorrect, dtype=np.float64),
+                np.ascontiguousarray(Total, dtype=np.float64),
+                float(Gamma), float(Lambda))
+        results = minimize(_neg_loglik, guess, args=args, method = 'BFGS',
+                           jac=_neg_loglik_grad)
+        # Fall back to the derivative-free search if BFGS does not converge
+        if not results.success:
+            results = minimize(_neg_loglik, guess, args=args, method = 'Nelder-Mead')
+    else:
+        results = minimize(MLE_PF, guess, method = 'Nelder-Mead')
 
     return results
 
@@ -12,6 +12,7 @@ several type of PFs, plotting the results and calculating the inverse values
 
 # Import required libraries
 import numpy as np
+from scipy.special import expit
 from pynverse import inversefunc
 import matplotlib.pyplot as plt
 
@@ -26,7 +27,7 @@ class PsychometricFunction():
         
 
         if self.type_func == "Logistic":
-            self.PF = lambda x: self.Gamma+ (1-self.Gamma-self.Lambda) * (1 / (1 + np.exp(-self.Beta*(x-self.Alpha))))
+            self.PF = lambda x: self.Gamma+ (1-self.Gamma-self.Lambda) * expit(self.Beta*(x-self.Alpha))
         
         elif self.type_func == "Weibull":
             self.PF = lambda x: self.Gamma+ (1-self.Gamma-self.Lambda) * (1 - np.exp(-((x/self.Alpha)**self.Beta)))